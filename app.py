@@ -1,9 +1,27 @@
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import json
 import os
+import tempfile
+import threading
 import dash
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet
 import plotly.graph_objects as go
-from dash import Input, Output, dcc, html
+import plotly.io as pio
+from plotly.colors import qualitative
+from dash import Input, Output, State, dcc, html
+from flask_caching import Cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: cache conversions are only locked within a process
+    fcntl = None
 
 name_map = {
     'a07BindR1': 'mAb 83-7 binding score rep 1',
@@ -34,17 +52,204 @@ name_map = {
 data_directory = "data/"
 
 
-# Load all CSV files into a dictionary of DataFrames based on filename
-data_files = {
-    file: pd.read_csv(os.path.join(data_directory, file))
-    for file in os.listdir(data_directory)
-    if file.endswith(".csv")
+# Directory holding the Parquet copies of the CSV files
+cache_directory = os.path.join(data_directory, ".cache")
+
+# Variant amino acid columns shown on the heatmap rows, and their tick positions
+ay_columns = list("ACDEFGHIKLMNPQRSTVWY")
+ay_tickvals = list(range(len(ay_columns)))
+
+# "yes"/empty flag columns available for conditional coloring
+site_columns = ["site_1", "site_2", "ab8307_site", "ab8314_site", "c_c"]
+
+# Columns loaded into DataFrames for the pair merge and scatter plot; the A-Y
+# scores are only read from the memory-mapped heatmap cache
+frame_columns = ["position", "wt_aa", "median_score"] + site_columns
+
+# Columns actually used by the plots
+used_columns = frame_columns + ay_columns
+
+# Arrow types of the used columns; string columns are dictionary encoded
+column_types = {
+    "position": pa.int32(),
+    "wt_aa": pa.dictionary(pa.int32(), pa.string()),
+    "median_score": pa.float64(),
+    **{col: pa.dictionary(pa.int32(), pa.string()) for col in site_columns},
+    **{col: pa.float64() for col in ay_columns},
 }
 
+
+# Version of this module's code, so cached data and figures are not reused across deploys
+with open(__file__, "rb") as source_file:
+    code_version = hashlib.sha1(source_file.read()).hexdigest()
+
+# Per cache file locks serializing conversions between threads of this process
+_cache_locks = {}
+
+# Mode of newly written cache files; temporary files would otherwise stay 0600
+_umask = os.umask(0)
+os.umask(_umask)
+cache_file_mode = 0o666 & ~_umask
+
+
+def _source_stamp(path):
+    """Return the code version, mtime and size that a cache built from `path` is valid for."""
+    stat = os.stat(path)
+    return [code_version, stat.st_mtime_ns, stat.st_size]
+
+
+def _is_stale(cache_path, path):
+    """Return whether a cache file is missing or was not built from the current source file and code."""
+    try:
+        with open(f"{cache_path}.stamp") as stamp_file:
+            stamp = json.load(stamp_file)
+    except (OSError, ValueError):
+        return True
+    return not os.path.exists(cache_path) or stamp != _source_stamp(path)
+
+
+@contextlib.contextmanager
+def _cache_lock(cache_name):
+    """Hold an exclusive lock on one cache entry, across threads and server processes."""
+    os.makedirs(cache_directory, exist_ok=True)
+    with _cache_locks.setdefault(cache_name, threading.Lock()):
+        with open(os.path.join(cache_directory, f"{cache_name}.lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def _write_atomic(cache_path, write):
+    """Write a cache file through a temporary file, so readers never see a partial file."""
+    with tempfile.NamedTemporaryFile(dir=cache_directory, suffix=".tmp", delete=False) as tmp:
+        try:
+            write(tmp)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    os.chmod(tmp.name, cache_file_mode)
+    os.replace(tmp.name, cache_path)
+
+
+def _write_cache(cache_path, write, stamp):
+    """Write a cache file atomically, then the stamp of the source it was built from."""
+    _write_atomic(cache_path, write)
+    # The stamp goes last, so an interrupted write leaves the cache stale rather than fresh
+    _write_atomic(f"{cache_path}.stamp", lambda f: f.write(json.dumps(stamp).encode()))
+
+
+def _to_parquet_cache(path):
+    """Convert a CSV file to Parquet once and return the cached file path."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(cache_directory, f"{name}.parquet")
+    if _is_stale(cache_path, path):
+        with _cache_lock(f"{name}.parquet"):
+            # Another thread or worker may have converted the file while we waited
+            if _is_stale(cache_path, path):
+                stamp = _source_stamp(path)
+                table = pyarrow.csv.read_csv(path, convert_options=pyarrow.csv.ConvertOptions(
+                    include_columns=used_columns,
+                    column_types=column_types,
+                    strings_can_be_null=True
+                ))
+                _write_cache(cache_path, lambda f: pyarrow.parquet.write_table(table, f), stamp)
+    return cache_path
+
+
+@functools.lru_cache(maxsize=8)
+def load(file):
+    """Load a data file on demand, reading only the columns used by the merge and scatter plot."""
+    cache_path = _to_parquet_cache(os.path.join(data_directory, file))
+    df = pd.read_parquet(cache_path, columns=frame_columns)
+    # Store the "yes"/empty flags as booleans so they can be used directly as masks
+    for col in site_columns:
+        df[col] = df[col].eq("yes")
+    # A sorted position index lets merges take the monotonic join path
+    return df.sort_values("position").set_index("position")
+
+
+@dataclasses.dataclass(frozen=True)
+class Frame:
+    """Heatmap inputs of a data file as plain NumPy arrays, one entry per position."""
+    positions: np.ndarray
+    wt_aa: np.ndarray
+    median_score: np.ndarray
+    ay_zT: np.ndarray  # A-Y scores as a memory-mapped float32 (variants, positions) array
+
+
+def _to_frame_cache(file):
+    """Write the heatmap inputs of a data file as .npy and Parquet once and return both paths."""
+    path = os.path.join(data_directory, file)
+    name = os.path.splitext(os.path.basename(path))[0]
+    ay_path = os.path.join(cache_directory, f"{name}.ay.npy")
+    meta_path = os.path.join(cache_directory, f"{name}.meta.parquet")
+    if _is_stale(ay_path, path) or _is_stale(meta_path, path):
+        with _cache_lock(f"{name}.frame"):
+            # Another thread or worker may have written the files while we waited
+            if _is_stale(ay_path, path) or _is_stale(meta_path, path):
+                # Stamp before reading, so a concurrent CSV update leaves the cache stale
+                stamp = _source_stamp(path)
+                parquet_path = _to_parquet_cache(path)
+                df = pd.read_parquet(parquet_path, columns=["position", "wt_aa", "median_score"] + ay_columns)
+                df = df.sort_values("position")
+                ay_zT = np.ascontiguousarray(df[ay_columns].to_numpy(dtype=np.float32).T)
+                # Replacing rather than rewriting the files keeps existing memory maps valid
+                _write_cache(ay_path, lambda f: np.save(f, ay_zT), stamp)
+                _write_cache(meta_path, lambda f: df[["position", "wt_aa", "median_score"]].to_parquet(f, index=False), stamp)
+    return ay_path, meta_path
+
+
+@functools.lru_cache(maxsize=8)
+def load_frame(file):
+    """Load a data file with its A-Y block pre-transposed and memory-mapped for the heatmap."""
+    ay_path, meta_path = _to_frame_cache(file)
+    meta = pd.read_parquet(meta_path)
+    return Frame(
+        positions=meta["position"].to_numpy(),
+        wt_aa=meta["wt_aa"].to_numpy(),
+        median_score=meta["median_score"].to_numpy(),
+        ay_zT=np.load(ay_path, mmap_mode="r"),
+    )
+
+
+# Heatmaps spanning more positions than this are downsampled before being sent
+max_heatmap_positions = 2000
+
+# Heatmap color range and the number of integer levels on each side of zero
+heatmap_zmax = 0.8
+heatmap_levels = 127
+
+# List the available CSV files; they are only read when a callback needs them
+data_files = sorted(f for f in os.listdir(data_directory) if f.endswith(".csv"))
+
 # Sequence annotation to display on top of each heatmap
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
+server = app.server  # WSGI entry point for gunicorn
+
+# Cache of serialized figures, shared by all server processes
+cache = Cache(app.server, config={
+    "CACHE_TYPE": "FileSystemCache",
+    "CACHE_DIR": os.getenv("DASH_CACHE_DIR", "/tmp/dash-cache")
+})
+
+
+# Figure version last seen per data file, to notice CSV updates in a running process
+_seen_versions = {}
+
+
+def _figure_version(file):
+    """Return the cache version of figures built from a data file, matching its data cache stamps."""
+    version = tuple(_source_stamp(os.path.join(data_directory, file)))
+    if _seen_versions.setdefault(file, version) != version:
+        # The CSV changed since it was loaded; lru_cache cannot evict a single file,
+        # so drop the in-process caches of every file
+        for cached in (load, load_frame, _merge_sorted, _build_heatmap):
+            cached.cache_clear()
+        _seen_versions[file] = version
+    return version
 
 # Layout of the app
 app.layout = html.Div([
@@ -52,10 +257,10 @@ app.layout = html.Div([
 
     # Dropdowns for selecting file pairs
     html.Label("Select first CSV file:"),
-    dcc.Dropdown(id="file1-dropdown", options=[{"label": name, "value": name} for name in data_files.keys()], multi=False),
+    dcc.Dropdown(id="file1-dropdown", options=[{"label": name, "value": name} for name in data_files], multi=False),
 
     html.Label("Select second CSV file:"),
-    dcc.Dropdown(id="file2-dropdown", options=[{"label": name, "value": name} for name in data_files.keys()], multi=False),
+    dcc.Dropdown(id="file2-dropdown", options=[{"label": name, "value": name} for name in data_files], multi=False),
 
     # Dropdown to select multiple features for coloring
     html.Label("Select up to 4 columns for conditional coloring:"),
@@ -84,24 +289,36 @@ app.layout = html.Div([
     ])
 ])
 
-# Callback to update scatter plot and heatmaps based on file selections and coloring choice
-@app.callback(
-    [Output("scatter-plot", "figure"),
-     Output("heatmap1", "figure"),
-     Output("heatmap2", "figure")],
-    [Input("file1-dropdown", "value"),
-     Input("file2-dropdown", "value"),
-     Input("color-dropdown", "value")]
-)
-def update_plots(file1, file2, color_columns):
-    if file1 is None or file2 is None or file1 == file2:
-        return {}, {}, {}
 
-    # Load and merge data based on `position`
-    df1 = data_files[file1]
-    df2 = data_files[file2]
-    merged_df = pd.merge(df1, df2, on="position", suffixes=("_1", "_2"))
+def get_descriptive_name(filename):
+    base_name = filename.replace('.csv', '')  # Remove the .csv extension
+    return name_map.get(base_name, base_name)  # Use the mapped name or fallback to base_name
+
+
+@functools.lru_cache(maxsize=64)
+def _merge_sorted(file_a, file_b):
+    """Join two data files on their `position` index, cached once per unordered file pair."""
+    df1 = load(file_a)
+    df2 = load(file_b)
+    return df1.join(df2, lsuffix="_1", rsuffix="_2", how="inner")
 
+
+def _get_merged(file1, file2):
+    """Merge two data files on `position`; callers must not mutate the result."""
+    key = tuple(sorted([file1, file2]))
+    merged_df = _merge_sorted(*key)
+    if key[0] != file1:
+        # Reuse the merge of the swapped pair by exchanging the _1/_2 suffixes
+        swap = {"_1": "_2", "_2": "_1"}
+        merged_df = merged_df.rename(
+            columns={col: col[:-2] + swap[col[-2:]] for col in merged_df.columns if col[-2:] in swap},
+            copy=False
+        )
+    return merged_df
+
+
+def _build_scatter(merged_df, color_columns, file1, file2):
+    """Build the median score scatter plot, colored by the selected site columns."""
     # Restrict to the first 4 selected color columns
     if color_columns:
         color_columns = color_columns[:4]
@@ -115,41 +332,52 @@ def update_plots(file1, file2, color_columns):
         "c_c": "orange"
     }
 
-    # Initialize a color column as "gray" for default
-    merged_df["color"] = "gray"
-    if color_columns:
-        for col in color_columns:
-            color = color_map.get(col, "gray")
-            merged_df.loc[merged_df[col + "_1"] == "yes", "color"] = color
-
-    # Generate scatter plot
-    scatter_fig = px.scatter(
-        merged_df,
-        x="median_score_1",
-        y="median_score_2",
-        color="color",
-        hover_data=["position"]
-    )
-
-    # Add position annotations for selected color points
-    annotations = [
-        dict(
-            x=row["median_score_1"],
-            y=row["median_score_2"],
-            text=row["position"],
-            showarrow=True,
-            arrowhead=2,
-            ax=0,
-            ay=-20,
-            bgcolor="rgba(255,255,255,0.7)"
-        )
-        for _, row in merged_df[merged_df["color"] != "gray"].iterrows()
-    ]
-    scatter_fig.update_layout(annotations=annotations)
-
-    def get_descriptive_name(filename):
-        base_name = filename.replace('.csv', '')  # Remove the .csv extension
-        return name_map.get(base_name, base_name)  # Use the mapped name or fallback to base_name
+    # Color points flagged "yes" in the first file, "gray" by default; later
+    # selections take precedence, so the conditions are checked in reverse
+    color_columns = list(reversed(color_columns or []))
+    conds = [merged_df[col + "_1"].to_numpy() for col in color_columns]
+    choices = [color_map.get(col, "gray") for col in color_columns]
+    colors = np.select(conds, choices, default="gray") if conds else np.full(len(merged_df), "gray")
+
+    x1 = merged_df["median_score_1"].to_numpy()
+    y2 = merged_df["median_score_2"].to_numpy()
+    positions = merged_df.index.values
+
+    # Generate scatter plot with one WebGL trace per color category, using the
+    # default qualitative palette in order of appearance as plotly express does
+    scatter_fig = go.Figure()
+    for i, color in enumerate(pd.unique(colors)):
+        mask = colors == color
+        scatter_fig.add_trace(go.Scattergl(
+            x=x1[mask],
+            y=y2[mask],
+            customdata=positions[mask],
+            mode="markers",
+            name=color,
+            legendgroup=color,
+            marker=dict(color=qualitative.Plotly[i % len(qualitative.Plotly)]),
+            hovertemplate=f"color={color}<br>median_score_1=%{{x}}<br>median_score_2=%{{y}}<br>position=%{{customdata}}<extra></extra>"
+        ))
+    scatter_fig.update_layout(legend=dict(title=dict(text="color"), tracegroupgap=0))
+
+    # Label selected color points with their position in a single WebGL trace
+    sel = colors != "gray"
+    if sel.any():
+        scatter_fig.add_trace(go.Scattergl(
+            x=x1[sel],
+            y=y2[sel],
+            text=positions[sel],
+            mode="markers+text",
+            textposition="top center",
+            textfont=dict(size=10),
+            marker=dict(size=4, color="black"),
+            hoverinfo="skip",
+            showlegend=False
+        ))
+
+    # Extents of the zero lines drawn across the plot
+    y2_min, y2_max = y2.min(), y2.max()
+    x1_min, x1_max = x1.min(), x1.max()
 
     # Set white background, gridlines, axis labels, plot border, and larger tick font size
     scatter_fig.update_layout(
@@ -176,8 +404,8 @@ def update_plots(file1, file2, color_columns):
                 type="line",
                 xref="x",
                 yref="y",
-                x0=0, y0=min(merged_df["median_score_2"]),
-                x1=0, y1=max(merged_df["median_score_2"]),
+                x0=0, y0=y2_min,
+                x1=0, y1=y2_max,
                 line=dict(color="black", width=1)
             ),
             # Add horizontal line at y=0
@@ -185,127 +413,181 @@ def update_plots(file1, file2, color_columns):
                 type="line",
                 xref="x",
                 yref="y",
-                x0=min(merged_df["median_score_1"]), y0=0,
-                x1=max(merged_df["median_score_1"]), y1=0,
+                x0=x1_min, y0=0,
+                x1=x1_max, y1=0,
                 line=dict(color="black", width=1)
             )
         ]
     )
 
-   
+    return scatter_fig
 
-    wt_aa = df1["wt_aa"].values  # Assuming wt_aa is already a column in df2
 
-    # Generate hover text including wt_aa information
- # Generate hover text matrix that matches the shape of z (A-Y columns by positions)
-    hover_text = [
-        [
-            f"Position: {pos}<br>WT aa: {wt}<br>Variant aa: {variant}<br>Variant Score: {score:.4f}<br>Median Score: {median:.4f}"
-            for pos, score, wt, median in zip(
-                df2["position"],
-                row,
-                df2["wt_aa"],
-                df2["median_score"]
-            )
-        ]
-        for variant, row in zip(df2.loc[:, "A":"Y"].columns, df2.loc[:, "A":"Y"].values.T)
-    ]
+def _max_abs_columns(z, starts):
+    """Return, per row of z and bin beginning at `starts`, the column of the most extreme value in the bin."""
+    magnitude = np.where(np.isnan(z), -1.0, np.abs(z))
+    bin_max = np.maximum.reduceat(magnitude, starts, axis=1)
+    bin_of_column = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, z.shape[1])))
+    # First column reaching the bin maximum; all-NaN bins fall back to their first column
+    candidates = np.where(magnitude == bin_max[:, bin_of_column], np.arange(z.shape[1]), z.shape[1])
+    return np.minimum.reduceat(candidates, starts, axis=1)
 
-    # Create heatmap figure
-    heatmap_fig1 = go.Figure(data=go.Heatmap(
-        z=df1.loc[:, "A":"Y"].values.T,
-        x=df1["position"],
-        y=df1.loc[:, "A":"Y"].columns,
-        colorscale="RdBu_r",
-        zmin=-0.8,
-        zmax=0.8,
-        colorbar=dict(
-            title=dict(
-                text="variant score (log2)",
-                side="right",
-                font=dict(size=12)
-            ),
-            tickvals=[-0.8, 0, 0.8]
-        ),
-        hoverongaps=False,
-        text=hover_text,  # Custom hover text with wt_aa included
-        hovertemplate="%{text}"  # Display custom hover text
-    ))
 
-    # Update layout settings
-    heatmap_fig1.update_layout(
-        title=file1,
-        xaxis=dict(title="Position", showgrid=False),
-        yaxis=dict(
-            tickmode="array",
-            tickvals=list(range(len(df2.loc[:, "A":"Y"].columns))),
-            ticktext=df2.loc[:, "A":"Y"].columns,
-            automargin=True,
-            fixedrange=True,
-            showgrid=False
-        ),
-        plot_bgcolor="grey",
-    )
+def _quantize(z):
+    """Map scores onto integer color levels in [-heatmap_levels, heatmap_levels], keeping NaN gaps."""
+    levels = np.clip(np.rint(z * (heatmap_levels / heatmap_zmax)), -heatmap_levels, heatmap_levels)
+    return levels.astype(np.float32)
+
 
+@functools.lru_cache(maxsize=32)
+def _build_heatmap(file_name, x_range=None):
+    """Build the A-Y variant score heatmap of a single data file, optionally restricted to an x window."""
+    frame = load_frame(file_name)
+    window = slice(None)
+    if x_range is not None:
+        window = slice(
+            np.searchsorted(frame.positions, x_range[0], side="left"),
+            np.searchsorted(frame.positions, x_range[1], side="right")
+        )
 
+    z = frame.ay_zT[:, window]
+    x = frame.positions[window]
 
-    
-    #wt_aa = df2["wt_aa"].values  # Assuming wt_aa is already a column in df2
-    median_score = df2["median_score"].values
+    # Per-position hover values (rounded to hover precision), matching the columns of z
+    per_position = np.stack([x, frame.wt_aa[window], np.round(frame.median_score[window], 4)], axis=1)
 
-    # Generate hover text including wt_aa information
- # Generate hover text matrix that matches the shape of z (A-Y columns by positions)
-    hover_text = [
-        [
-            f"Position: {pos}<br>WT aa: {wt}<br>Variant aa: {variant}<br>Variant Score: {score:.4f}<br>Median Score: {median:.4f}"
-            for pos, score, wt, median in zip(
-                df2["position"],
-                row,
-                df2["wt_aa"],
-                df2["median_score"]
-            )
-        ]
-        for variant, row in zip(df2.loc[:, "A":"Y"].columns, df2.loc[:, "A":"Y"].values.T)
-    ]
+    # Bin wide heatmaps column-wise so the color signal of extreme variants survives;
+    # each cell keeps the hover values of the position its score was taken from
+    if len(x) > max_heatmap_positions:
+        starts = np.linspace(0, len(x), max_heatmap_positions, endpoint=False).astype(int)
+        columns = _max_abs_columns(z, starts)
+        z = np.take_along_axis(z, columns, axis=1)
+        x = x[starts]
+        cell_values = per_position[columns]
+    else:
+        cell_values = np.broadcast_to(per_position, (z.shape[0],) + per_position.shape)
+
+    # Hover values per cell of z (A-Y columns by positions) plus the variant score at
+    # hover precision, since z only carries color levels; the hover text itself is
+    # formatted in the browser by the hovertemplate
+    customdata = np.concatenate([cell_values, np.round(z.astype(np.float64), 4)[..., np.newaxis]], axis=2)
 
     # Create heatmap figure
-    heatmap_fig2 = go.Figure(data=go.Heatmap(
-        z=df2.loc[:, "A":"Y"].values.T,
-        x=df2["position"],
-        y=df2.loc[:, "A":"Y"].columns,
+    heatmap_fig = go.Figure(data=go.Heatmap(
+        z=_quantize(z),
+        x=x,
+        y=ay_columns,
         colorscale="RdBu_r",
-        zmin=-0.8,
-        zmax=0.8,
+        zmin=-heatmap_levels,
+        zmax=heatmap_levels,
         colorbar=dict(
             title=dict(
                 text="variant score (log2)",
                 side="right",
                 font=dict(size=12)
             ),
-            tickvals=[-0.8, 0, 0.8]
+            tickvals=[-heatmap_levels, 0, heatmap_levels],
+            ticktext=[f"{-heatmap_zmax:g}", "0", f"{heatmap_zmax:g}"]
         ),
         hoverongaps=False,
-        text=hover_text,  # Custom hover text with wt_aa included
-        hovertemplate="%{text}"  # Display custom hover text
+        customdata=customdata,  # Position, wt_aa, median score and variant score per cell
+        hovertemplate=(
+            "Position: %{customdata[0]}<br>WT aa: %{customdata[1]}<br>Variant aa: %{y}"
+            "<br>Variant Score: %{customdata[3]:.4f}<br>Median Score: %{customdata[2]:.4f}<extra></extra>"
+        )
     ))
 
     # Update layout settings
-    heatmap_fig2.update_layout(
-        title=file2,
+    heatmap_fig.update_layout(
+        title=file_name,
         xaxis=dict(title="Position", showgrid=False),
         yaxis=dict(
             tickmode="array",
-            tickvals=list(range(len(df2.loc[:, "A":"Y"].columns))),
-            ticktext=df2.loc[:, "A":"Y"].columns,
+            tickvals=ay_tickvals,
+            ticktext=ay_columns,
             automargin=True,
             fixedrange=True,
             showgrid=False
         ),
         plot_bgcolor="grey",
     )
+    if x_range is not None:
+        heatmap_fig.update_xaxes(range=list(x_range))
+
+    return heatmap_fig
+
+
+# Callback to update scatter plot and heatmaps based on file selections and coloring choice
+@app.callback(
+    [Output("scatter-plot", "figure"),
+     Output("heatmap1", "figure"),
+     Output("heatmap2", "figure")],
+    [Input("file1-dropdown", "value"),
+     Input("file2-dropdown", "value"),
+     Input("color-dropdown", "value")]
+)
+def update_plots(file1, file2, color_columns):
+    # Only files listed in the data directory may be loaded
+    if file1 not in data_files or file2 not in data_files or file1 == file2:
+        return {}, {}, {}
+
+    # Selection order decides which color wins, so the key keeps it; only the
+    # scatter plot depends on the color selection, the heatmaps are cached per file
+    color_columns_tuple = tuple((color_columns or [])[:4])
+    version1, version2 = _figure_version(file1), _figure_version(file2)
+    figure_jsons = (
+        _scatter_json(file1, file2, color_columns_tuple, version1, version2),
+        _heatmap_json(file1, version1),
+        _heatmap_json(file2, version2),
+    )
 
-    return scatter_fig, heatmap_fig1, heatmap_fig2
+    # Cached figures skip building and Plotly serialization, but Dash still
+    # encodes the returned dicts into its response
+    return tuple(json.loads(fig_json) for fig_json in figure_jsons)
+
+
+@cache.memoize(timeout=3600)
+def _scatter_json(file1, file2, color_columns_tuple, version1, version2):
+    """Build the scatter plot of a file pair as figure JSON; the versions only key the cache."""
+    merged_df = _get_merged(file1, file2)
+    return pio.to_json(_build_scatter(merged_df, color_columns_tuple, file1, file2))
+
+
+@cache.memoize(timeout=3600)
+def _heatmap_json(file_name, version):
+    """Build the heatmap of a data file as figure JSON; the version only keys the cache."""
+    return pio.to_json(_build_heatmap(file_name))
+
+
+def _zoom_heatmap(relayout_data, file_name):
+    """Resend only the zoomed x window of a downsampled heatmap, at full resolution where possible."""
+    if file_name not in data_files or not relayout_data:
+        return dash.no_update
+    # Drop in-process caches first if the CSV changed since it was loaded
+    _figure_version(file_name)
+    if len(load_frame(file_name).positions) <= max_heatmap_positions:
+        return dash.no_update
+    if relayout_data.get("xaxis.autorange"):
+        return _build_heatmap(file_name)
+
+    # Plotly reports a zoom either as both ends separately or as a two-item list
+    x_range = relayout_data.get("xaxis.range")
+    if x_range is None and "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        x_range = [relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]]
+    if not isinstance(x_range, (list, tuple)) or len(x_range) != 2:
+        return dash.no_update
+    return _build_heatmap(file_name, (x_range[0], x_range[1]))
+
+
+# Callbacks to refine each heatmap when it is zoomed or panned
+for graph_id, dropdown_id in [("heatmap1", "file1-dropdown"), ("heatmap2", "file2-dropdown")]:
+    app.callback(
+        Output(graph_id, "figure", allow_duplicate=True),
+        Input(graph_id, "relayoutData"),
+        State(dropdown_id, "value"),
+        prevent_initial_call=True
+    )(_zoom_heatmap)
 
 # Run the app
 if __name__ == "__main__":
-    app.run_server(debug=True, port=int(os.getenv("PORT", 8051)), host="0.0.0.0")
+    app.run_server(debug=os.getenv("DASH_DEBUG") == "1", port=int(os.getenv("PORT", 8051)), host="0.0.0.0")